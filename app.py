@@ -1,7 +1,20 @@
+import atexit
+import hashlib
+import io
+import json
+import logging
 import os
+import re
 import tempfile
+import threading
+import time
+import zipfile
+from collections import Counter, OrderedDict, defaultdict, namedtuple
+from functools import lru_cache
+import numpy as np
 from flask import Flask, request, render_template, jsonify, session
 from PyPDF2 import PdfReader
+from PyPDF2.errors import PyPdfError
 from dotenv import load_dotenv
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_huggingface import HuggingFaceEndpointEmbeddings
@@ -15,6 +28,8 @@ from flask import send_file
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # -----------------------------
 # INIT FUNCTIONS
 # -----------------------------
@@ -31,6 +46,15 @@ def init_embeddings(hf_api_token: str):
         huggingfacehub_api_token=hf_api_token
     )
 
+# One client per process, shared by every request
+@lru_cache(maxsize=None)
+def get_llm():
+    return init_llm(os.getenv("GOOGLE_API_KEY"))
+
+@lru_cache(maxsize=None)
+def get_embeddings():
+    return init_embeddings(os.getenv("HF_API_TOKEN"))
+
 # -----------------------------
 # PROMPTS
 # -----------------------------
@@ -421,15 +445,943 @@ Give a **clear, patient-friendly conclusion**:
     ("human", "Summarize the following report:\n\n{context}")
 ])
 
+TREND_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """You are a medical report summarizer explaining how a patient's lab results changed over time.
+You are given a trend table built from the patient's successive lab reports.
+Use only the values, dates and reference ranges in the table (do not invent values or ranges).
+
+Provide the final output in this structure:
+
+### Improving
+- [Analyte]: [first value] → [latest value] ([change]) → [short interpretation]
+
+### Worsening
+- [Analyte]: [first value] → [latest value] ([change]) → [short interpretation]
+
+### Stable
+- [Analyte]: [latest value] ([range]) → [short interpretation]
+
+### Conclusion
+Give a **clear, patient-friendly conclusion** about the overall direction of the results.
+Call out any marker that crossed its reference range.
+Leave out any section that would be empty.
+"""),
+    ("human", "Trend table:\n\n{trend_table}")
+])
+
 # -----------------------------
 # UTILS
 # -----------------------------
-def extract_pages(file_path, page_numbers):
+def extract_all_text(file_path):
+    return "\n".join(read_page_texts(file_path))
+
+@lru_cache(maxsize=32)
+def _read_page_texts(file_path, mtime, size):
+    # mtime/size are part of the cache key so a re-uploaded file is re-read
     reader = PdfReader(file_path)
-    text = "\n".join(
-        reader.pages[i].extract_text() for i in page_numbers if i < len(reader.pages)
+    return tuple(page.extract_text() or "" for page in reader.pages)
+
+def read_page_texts(file_path):
+    """Extracted text of every page, parsed once per file version."""
+    stat = os.stat(file_path)
+    return _read_page_texts(file_path, stat.st_mtime_ns, stat.st_size)
+
+def extract_page_texts(file_path, page_numbers):
+    """Return (page_number, text) pairs so chunks can remember their page."""
+    texts = read_page_texts(file_path)
+    return [(i, texts[i]) for i in page_numbers if i < len(texts)]
+
+# -----------------------------
+# CHUNKING
+# -----------------------------
+# Token counts follow BERT pre-tokenization: runs of letters/digits and single
+# punctuation marks count separately, so "HbA1c 5.2 % 4.0 - 5.6" is 12 tokens
+# rather than 6 words. MiniLM's WordPiece step can split long terms (e.g.
+# "creatinine") further, so this is a lower bound; the default chunk size leaves
+# headroom under the model's 256-piece window instead of relying on truncation.
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "128"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "20"))
+
+_PRE_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+def count_tokens(text):
+    return len(_PRE_TOKEN.findall(text))
+
+def _overlap_tail(items, overlap_tokens):
+    """Trailing items of a finished chunk that fit in the overlap budget."""
+    carry, carry_tokens = [], 0
+    for item in reversed(items):
+        item_tokens = count_tokens(item)
+        if carry_tokens + item_tokens > overlap_tokens:
+            break
+        carry.insert(0, item)
+        carry_tokens += item_tokens
+    return carry, carry_tokens
+
+def _split_long_line(line, max_tokens, overlap_tokens):
+    pieces, current, current_tokens = [], [], 0
+    for word in line.split():
+        tokens = count_tokens(word)
+        if current and current_tokens + tokens > max_tokens:
+            pieces.append(" ".join(current))
+            current, current_tokens = _overlap_tail(current, overlap_tokens)
+        current.append(word)
+        current_tokens += tokens
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+def chunk_pages(pages, max_tokens=CHUNK_MAX_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS):
+    """
+    Merge the lines of each page into chunks of at most `max_tokens` tokens.
+
+    Consecutive chunks of a page share up to `overlap_tokens` tokens of trailing
+    lines. Chunks never span pages, so each one carries a single page number.
+    Returns (texts, metadatas) ready for FAISS.from_texts.
+    """
+    if overlap_tokens >= max_tokens:
+        raise ValueError("Chunk overlap must be smaller than the chunk size")
+
+    texts, metadatas = [], []
+
+    def emit(page, lines):
+        metadatas.append({"page": page, "chunk": len(texts)})
+        texts.append("\n".join(lines))
+
+    for page, page_text in pages:
+        current, current_tokens = [], 0
+        for raw_line in page_text.split("\n"):
+            line = raw_line.strip()
+            if not line:
+                continue
+            if count_tokens(line) > max_tokens:
+                pieces = _split_long_line(line, max_tokens, overlap_tokens)
+            else:
+                pieces = [line]
+
+            for piece in pieces:
+                tokens = count_tokens(piece)
+                if current and current_tokens + tokens > max_tokens:
+                    emit(page, current)
+                    # Carry trailing lines over as overlap for the next chunk
+                    carry, carry_tokens = _overlap_tail(current, overlap_tokens)
+                    if carry_tokens + tokens > max_tokens:
+                        carry, carry_tokens = [], 0
+                    current, current_tokens = carry, carry_tokens
+                current.append(piece)
+                current_tokens += tokens
+
+        if current:
+            emit(page, current)
+
+    return texts, metadatas
+
+def build_context(file_path, page_numbers, embeddings):
+    """
+    Chunk the given pages, embed them into FAISS and return the joined context
+    together with chunking stats (chunk counts before/after and embed time).
+    """
+    pages = extract_page_texts(file_path, page_numbers)
+    texts, metadatas = chunk_pages(pages)
+    if not texts:
+        texts, metadatas = [""], [{"page": None, "chunk": 0}]
+
+    start = time.perf_counter()
+    vectorstore = FAISS.from_texts(texts, embeddings, metadatas=metadatas)
+    embed_seconds = time.perf_counter() - start
+
+    all_docs = vectorstore.similarity_search("", k=len(texts))
+    context = "\n\n".join([d.page_content for d in all_docs])
+
+    return context, chunking_stats(page_numbers, pages, texts, embed_seconds)
+
+def chunking_stats(page_numbers, pages, texts, embed_seconds):
+    stats = {
+        "legacy_chunks": len("\n".join(text for _, text in pages).split("\n\n")),
+        "chunks": len(texts),
+        "embed_seconds": round(embed_seconds, 3),
+    }
+    app.logger.info(
+        "Chunked pages %s: %d chunks (was %d with blank-line split), embedded in %.3fs",
+        list(page_numbers), stats["chunks"], stats["legacy_chunks"], embed_seconds
+    )
+    return stats
+
+# -----------------------------
+# NORMAL-RESULT FAST PATH
+# -----------------------------
+# Marker name -> (regex matching the report line, regex that disqualifies the line).
+# The exclusions stop e.g. "HDL" from matching the "Chol/HDL Ratio" line.
+_RATIO = r"ratio|\b(tc|chol\w*|hdl|ldl|sgot|ast|bun|albumin|a)\s*/\s*(hdl|ldl|sgpt|alt|creatinine|globulin|g)\b"
+
+MARKER_PATTERNS = {
+    "HbA1c": (r"\bhba1c\b|glycosylated ha?emoglobin|glycated ha?emoglobin", r"estimated|average"),
+    "Fasting Blood Sugar": (r"fasting (blood )?(sugar|glucose)|glucose,? fasting|\bfbs\b", None),
+    "hs-CRP": (r"\bhs[-\s]?crp\b|high sensitivity c[-\s]?reactive", None),
+    "Total Cholesterol": (r"total cholesterol|cholesterol,? total", _RATIO),
+    "Triglycerides": (r"\btriglycerides?\b", _RATIO),
+    "HDL Cholesterol": (r"\bhdl\b", rf"{_RATIO}|non[-\s]?hdl"),
+    "LDL Cholesterol": (r"\bldl\b", _RATIO),
+    "VLDL": (r"\bvldl\b", _RATIO),
+    "Cholesterol/HDL Ratio": (r"(total )?chol(esterol)?\s*/\s*hdl|\btc\s*/\s*hdl", None),
+    "LDL/HDL Ratio": (r"\bldl\s*/\s*hdl", None),
+    "Serum Creatinine": (r"\bcreatinine\b", rf"{_RATIO}|clearance"),
+    "Estimated GFR": (r"\begfr\b|estimated gfr|glomerular filtration", None),
+    "Blood Urea": (r"\burea\b", rf"{_RATIO}|nitrogen|\bbun\b"),
+    "Blood Urea Nitrogen (BUN)": (r"\bbun\b|urea nitrogen", _RATIO),
+    "BUN/Creatinine Ratio": (r"\bbun\s*/\s*creatinine", None),
+    "Uric Acid": (r"\buric acid\b", None),
+    "Sodium": (r"\bsodium\b", None),
+    "Chloride": (r"\bchloride\b", None),
+    "Calcium": (r"\bcalcium\b", None),
+    "Phosphorus": (r"\bphosph(orus|ate)\b", None),
+    "Magnesium": (r"\bmagnesium\b", None),
+    "Serum Iron": (r"\biron\b", r"binding|tibc|uibc|saturation"),
+    "UIBC": (r"\buibc\b|unsaturated iron binding", None),
+    "TIBC": (r"\btibc\b|total iron binding", None),
+    "Transferrin Saturation": (r"transferrin saturation|\btsat\b|% saturation", None),
+    "Zinc": (r"\bzinc\b", None),
+    "Total Bilirubin": (r"bilirubin,? total|total bilirubin", None),
+    "Direct Bilirubin": (r"bilirubin,? direct|direct bilirubin|\bconjugated bilirubin", None),
+    "Indirect Bilirubin": (r"bilirubin,? indirect|indirect bilirubin|unconjugated bilirubin", None),
+    "AST (SGOT)": (r"\bast\b|\bsgot\b", _RATIO),
+    "ALT (SGPT)": (r"\balt\b|\bsgpt\b", _RATIO),
+    "SGOT/SGPT Ratio": (r"\bsgot\s*/\s*sgpt|\bast\s*/\s*alt", None),
+    "ALP": (r"\balp\b|alkaline phosphatase", None),
+    "GGT": (r"\bggt\b|gamma[-\s]?glutamyl", None),
+    "Total Protein": (r"total protein|protein,? total|serum protein", None),
+    "Albumin": (r"\balbumin\b", rf"{_RATIO}|globulin|micro"),
+    "Globulin": (r"\bglobulin\b", rf"{_RATIO}|albumin|binding"),
+    "Albumin/Globulin Ratio": (r"\ba\s*/\s*g\b|albumin\s*/\s*globulin", None),
+    "TSH": (r"\btsh\b|thyroid stimulating", None),
+    "Free T4": (r"\bfree t4\b|\bft4\b|free thyroxine", None),
+    "Free T3": (r"\bfree t3\b|\bft3\b|free triiodothyronine", None),
+}
+
+# Every analyte above is a blood test; urine and timed collections ("Calcium, Urine",
+# "Urine Albumin", "24 Hr Protein") report the same names with other ranges.
+_URINE = r"\burin(e|ary)\b|\b24\s*-?\s*h(ou)?rs?\b"
+MARKER_PATTERNS = {
+    name: (pattern, rf"{_URINE}|{exclude}" if exclude else _URINE)
+    for name, (pattern, exclude) in MARKER_PATTERNS.items()
+}
+
+# Mirrors the "### heading / - marker" layout each prompt asks the LLM for, so a
+# templated summary renders the same way in the UI and in generate_summary_pdf.
+# The third item names the heading's markers in the templated conclusion.
+NORMAL_SECTION_LAYOUTS = {
+    "Diabetes": [
+        ("Core Diabetes Markers", ["HbA1c", "Fasting Blood Sugar"], "blood sugar markers"),
+        ("Supporting Risk Factors", ["hs-CRP", "Total Cholesterol", "Triglycerides",
+                                     "HDL Cholesterol", "LDL Cholesterol"], "the supporting risk factors"),
+    ],
+    "Hypertension": [
+        ("Kidney Function (linked to Hypertension)", ["Serum Creatinine", "Estimated GFR", "Sodium",
+                                                      "Chloride", "Blood Urea"], "kidney function"),
+        ("Cardiovascular Risk Marker", ["hs-CRP"], "inflammation (hs-CRP)"),
+        ("Lipid Profile (Heart & BP Risk Link)", ["Total Cholesterol", "HDL Cholesterol", "LDL Cholesterol",
+                                                  "Triglycerides", "Cholesterol/HDL Ratio"], "lipids"),
+        ("Supportive Factors", ["Magnesium"], "magnesium"),
+    ],
+    "Dyslipidemia": [
+        ("Lipid Profile (Core for Dyslipidemia Assessment)", ["Total Cholesterol", "Triglycerides",
+                                                              "HDL Cholesterol", "LDL Cholesterol", "VLDL",
+                                                              "Cholesterol/HDL Ratio", "LDL/HDL Ratio"],
+         "the lipid profile"),
+        ("Cardiovascular Risk Marker", ["hs-CRP"], "inflammation (hs-CRP)"),
+        ("Liver Function (affecting lipid metabolism)", ["ALT (SGPT)", "AST (SGOT)", "GGT",
+                                                         "Albumin/Globulin Ratio"], "liver markers"),
+        ("Kidney Function (Cardiovascular Link)", ["Serum Creatinine", "Estimated GFR", "Uric Acid"],
+         "kidney markers"),
+    ],
+    "Liver": [
+        ("Bilirubin Levels", ["Total Bilirubin", "Direct Bilirubin", "Indirect Bilirubin"], "bilirubin"),
+        ("Liver Enzymes (Hepatocellular Injury)", ["AST (SGOT)", "ALT (SGPT)", "SGOT/SGPT Ratio"],
+         "liver enzymes"),
+        ("Cholestasis Markers", ["ALP", "GGT"], "cholestasis markers"),
+        ("Liver Synthetic Function", ["Total Protein", "Albumin", "Globulin", "Albumin/Globulin Ratio"],
+         "protein markers"),
+        ("Supporting Findings", ["Serum Iron", "Zinc"], "iron and zinc"),
+    ],
+    "Kidney": [
+        ("Kidney Function Tests", ["Serum Creatinine", "Estimated GFR", "Blood Urea",
+                                   "Blood Urea Nitrogen (BUN)", "BUN/Creatinine Ratio", "Uric Acid"],
+         "kidney function tests"),
+        ("Electrolytes", ["Sodium", "Chloride", "Calcium", "Phosphorus", "Magnesium"], "electrolytes"),
+        ("Iron Studies (supportive, not primary kidney marker)", ["Serum Iron", "UIBC", "TIBC",
+                                                                  "Transferrin Saturation"], "iron studies"),
+    ],
+    "Thyroid": [
+        ("Thyroid Function Tests", ["TSH", "Free T4", "Free T3"], "thyroid hormones"),
+        ("Supporting Markers", ["Magnesium", "Serum Iron", "TIBC", "Zinc"], "the supporting markers"),
+    ],
+    "Anemia": [
+        ("Key Markers for Anemia", ["HbA1c", "Total Bilirubin", "Direct Bilirubin", "Indirect Bilirubin",
+                                    "Serum Iron", "UIBC", "TIBC", "Transferrin Saturation", "Zinc",
+                                    "Total Protein", "Globulin"], "the anemia-related markers"),
+    ],
+    "Obesity": [
+        ("HbA1c (Long-term blood sugar control)", ["HbA1c"], "HbA1c"),
+        ("Fasting Blood Sugar", ["Fasting Blood Sugar"], "fasting blood sugar"),
+        ("hs-CRP (Inflammation Marker)", ["hs-CRP"], "inflammation (hs-CRP)"),
+        ("Liver Function (Fatty Liver / NAFLD Risk)", ["AST (SGOT)", "ALT (SGPT)", "Total Protein", "Globulin"],
+         "liver markers"),
+        ("Iron Study (Metabolic Link via Anemia / Obesity)", ["Serum Iron", "UIBC", "TIBC"], "iron studies"),
+        ("Kidney Function (Uric Acid – Metabolic Syndrome Link)", ["Uric Acid"], "uric acid"),
+        ("Lipid Profile (Key for Metabolic Syndrome)", ["Total Cholesterol", "Triglycerides", "HDL Cholesterol",
+                                                       "LDL Cholesterol", "Cholesterol/HDL Ratio"], "lipids"),
+    ],
+    "Nutrition": [
+        ("Key Markers for Nutritional Deficiencies", ["Magnesium", "Total Protein", "Albumin", "Globulin",
+                                                     "Serum Iron", "TIBC", "Transferrin Saturation", "Zinc"],
+         "the nutritional markers"),
+    ],
+}
+
+# Markers that must all be present and normal before a section may skip the LLM.
+# The verdicts below only rely on these, so they hold whatever else was found.
+NORMAL_SECTION_CORE = {
+    "Diabetes": ["HbA1c", "Fasting Blood Sugar"],
+    "Hypertension": ["Serum Creatinine", "Sodium"],
+    "Dyslipidemia": ["Total Cholesterol", "Triglycerides", "HDL Cholesterol", "LDL Cholesterol"],
+    "Liver": ["Total Bilirubin", "AST (SGOT)", "ALT (SGPT)", "ALP"],
+    "Kidney": ["Serum Creatinine", "Estimated GFR"],
+    "Thyroid": ["TSH", "Free T4"],
+    "Anemia": ["Serum Iron", "TIBC", "Transferrin Saturation"],
+    "Obesity": ["HbA1c", "Fasting Blood Sugar", "Total Cholesterol", "Triglycerides", "HDL Cholesterol"],
+    "Nutrition": ["Total Protein", "Albumin", "Serum Iron"],
+}
+
+NORMAL_CONCLUSIONS = {
+    "Diabetes": "There is no sign of prediabetes or diabetes.",
+    "Hypertension": "No hypertension-related kidney or electrolyte changes were found.",
+    "Dyslipidemia": "The lipid profile does not suggest dyslipidemia.",
+    "Liver": "There is no evidence of a liver disorder in these results.",
+    "Kidney": "The kidneys appear to be working normally.",
+    "Thyroid": "Thyroid function appears normal (euthyroid).",
+    "Anemia": "Iron studies show no sign of iron deficiency.",
+    "Obesity": "No features of metabolic syndrome were found in these results.",
+    "Nutrition": "No nutritional deficiency was found among the markers checked.",
+}
+
+MarkerResult = namedtuple("MarkerResult", "value low high value_text range_text flagged")
+
+_NUMBER = r"\d+(?:\.\d+)?"
+_RANGE_BETWEEN = re.compile(rf"({_NUMBER})\s*(?:-|–|to)\s*({_NUMBER})", re.IGNORECASE)
+_RANGE_BELOW = re.compile(rf"(?:<=|≤|<|up ?to)\s*({_NUMBER})", re.IGNORECASE)
+_RANGE_ABOVE = re.compile(rf"(?:>=|≥|>)\s*({_NUMBER})")
+_VALUE = re.compile(rf"({_NUMBER})(H|L|HH|LL|\*)?")
+_FLAGS = {"H", "L", "HH", "LL", "*", "High", "Low", "HIGH", "LOW", "Abnormal", "ABNORMAL"}
+# Risk-band labels mean the line lists tiers, not one normal range
+_TIER_LABELS = re.compile(
+    r"desirable|borderline|optimal|prediabet|diabet|deficien|insufficien|sufficien|toxic|risk",
+    re.IGNORECASE,
+)
+_MAX_UNIT_TOKENS = 2
+
+def _find_ranges(rest):
+    """All reference-range expressions in the text as (match, low, high)."""
+    ranges = [(m, float(m.group(1)), float(m.group(2))) for m in _RANGE_BETWEEN.finditer(rest)]
+    taken = [(m.start(), m.end()) for m, _, _ in ranges]
+
+    def free(m):
+        return not any(start <= m.start() < end for start, end in taken)
+
+    for m in _RANGE_BELOW.finditer(rest):
+        if free(m):
+            high = float(m.group(1))
+            if not m.group(0).startswith(("<=", "≤", "up")):
+                high = np.nextafter(high, -np.inf)
+            ranges.append((m, np.nan, high))
+    for m in _RANGE_ABOVE.finditer(rest):
+        if free(m):
+            low = float(m.group(1))
+            if not m.group(0).startswith((">=", "≥")):
+                low = np.nextafter(low, np.inf)
+            ranges.append((m, low, np.nan))
+    return ranges
+
+def _take_value(tokens, unit_after):
+    """
+    Pick the result from a token list next to the range. With unit_after the
+    value is the number followed by at most _MAX_UNIT_TOKENS unit tokens (text
+    before the range); otherwise it is the first token (text after the range).
+    Returns (value token match, unit tokens) or None.
+    """
+    if unit_after:
+        unit = []
+        while tokens and not _VALUE.fullmatch(tokens[-1]) and len(unit) < _MAX_UNIT_TOKENS:
+            unit.insert(0, tokens.pop())
+        if not tokens:
+            return None
+        value = _VALUE.fullmatch(tokens[-1])
+        return (value, unit) if value else None
+
+    if not tokens:
+        return None
+    value = _VALUE.fullmatch(tokens[0])
+    if not value:
+        return None
+    unit = []
+    for token in tokens[1:1 + _MAX_UNIT_TOKENS]:
+        if re.search(r"\d", token):
+            break
+        unit.append(token)
+    return value, unit
+
+def _parse_result(rest):
+    """
+    Parse "value unit range" (or "range value unit") from the part of a line after
+    the marker name. Returns a MarkerResult, or None when the line is ambiguous:
+    several ranges, tiered risk-band labels, or no number directly next to the unit
+    or range. Missing bounds are NaN; strict bounds (<, >) are nudged inward so a
+    single inclusive comparison works.
+    """
+    ranges = _find_ranges(rest)
+    if len(ranges) != 1 or _TIER_LABELS.search(rest):
+        return None
+    match, low, high = ranges[0]
+
+    before = rest[:match.start()].split()
+    after = rest[match.end():].split()
+    flagged = any(token in _FLAGS for token in before + after)
+    before = [t for t in before if t not in _FLAGS]
+    after = [t for t in after if t not in _FLAGS]
+
+    picked = _take_value(list(before), unit_after=True)
+    if picked:
+        # A second number after the range makes the value ambiguous
+        if any(re.fullmatch(_NUMBER, t) for t in after):
+            return None
+    else:
+        if any(re.search(r"\d", t) for t in before):
+            return None
+        picked = _take_value(list(after), unit_after=False)
+        if not picked:
+            return None
+
+    value, unit = picked
+    value_text = " ".join([value.group(1), *unit])
+    return MarkerResult(
+        float(value.group(1)), low, high, value_text, match.group(0).strip(),
+        flagged or bool(value.group(2)),
     )
-    return text
+
+def extract_markers(text, marker_names):
+    """
+    Find each marker's result line in the report text.
+    Returns {marker: parsed result or None}; markers that never appear are left out.
+    A marker maps to None unless exactly one line mentions it and that line has a
+    parseable value/range, since with several lines we can't tell which is the result.
+    """
+    lines = [line.strip() for line in text.split("\n") if line.strip()]
+    found = {}
+    for name in marker_names:
+        pattern, exclude = MARKER_PATTERNS[name]
+        results = []
+        for line in lines:
+            match = re.search(pattern, line, re.IGNORECASE)
+            if not match or (exclude and re.search(exclude, line, re.IGNORECASE)):
+                continue
+            results.append(_parse_result(line[match.end():]))
+        if results:
+            found[name] = results[0] if len(results) == 1 else None
+    return found
+
+def check_ranges(values, lows, highs):
+    """Vectorized reference-range check. Returns a boolean array, True where in range."""
+    values, lows, highs = (np.asarray(a, dtype=float) for a in (values, lows, highs))
+    has_range = ~(np.isnan(lows) & np.isnan(highs))
+    return (
+        ~np.isnan(values) & has_range
+        & (values >= np.nan_to_num(lows, nan=-np.inf))
+        & (values <= np.nan_to_num(highs, nan=np.inf))
+    )
+
+def normal_fast_path(section, text):
+    """
+    Return a templated "all within range" summary for a section, or None when the
+    LLM is needed: a core marker is missing, or any marker found is abnormal,
+    flagged or unparseable.
+    """
+    layout = NORMAL_SECTION_LAYOUTS.get(section)
+    if not layout:
+        return None
+
+    marker_names = list(dict.fromkeys(name for _, names, _ in layout for name in names))
+    found = extract_markers(text, marker_names)
+    if any(result is None for result in found.values()):
+        return None
+    if not all(name in found for name in NORMAL_SECTION_CORE[section]):
+        return None
+
+    results = list(found.values())
+    in_range = check_ranges([r.value for r in results], [r.low for r in results], [r.high for r in results])
+    if not in_range.all() or any(r.flagged for r in results):
+        return None
+
+    lines, checked = [], []
+    for heading, heading_markers, phrase in layout:
+        rows = [
+            f"- {name}: {found[name].value_text} ({found[name].range_text}) → Normal"
+            for name in heading_markers if name in found
+        ]
+        if rows:
+            lines += [f"### {heading}", *rows, ""]
+            checked.append(phrase)
+
+    listed = checked[0] if len(checked) == 1 else f"{', '.join(checked[:-1])} and {checked[-1]}"
+    conclusion = f"All values checked for {listed} are within the report's reference ranges. {NORMAL_CONCLUSIONS[section]}"
+    lines += ["### Conclusion", conclusion]
+    return "\n".join(lines)
+
+def section_fast_path(section, file_path, page_numbers):
+    text = "\n".join(text for _, text in extract_page_texts(file_path, page_numbers))
+    summary = normal_fast_path(section, text)
+    if summary:
+        app.logger.info("%s: all markers within range, skipped LLM call", section)
+    return summary
+
+# -----------------------------
+# LONGITUDINAL MARKER STORE
+# -----------------------------
+MARKER_STORE_PATH = os.getenv(
+    "MARKER_STORE_PATH", os.path.join(tempfile.gettempdir(), "lab_marker_store.npz")
+)
+ANALYTES = list(MARKER_PATTERNS)
+
+class MarkerStore:
+    """
+    Columnar store of extracted marker values: one row per (patient, date, analyte).
+
+    Columns are parallel NumPy arrays and the analyte is stored as an index into
+    ANALYTES, so trend queries over many reports are plain array operations.
+    """
+
+    COLUMNS = ("patient", "date", "analyte", "value", "low", "high")
+
+    def __init__(self, path=MARKER_STORE_PATH):
+        # np.load needs the exact file name, so keep the suffix explicit
+        self.path = path if path.endswith(".npz") else f"{path}.npz"
+        self._lock = threading.Lock()
+        self._columns = self._empty()
+        self._load()
+
+    def _load(self):
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                columns = {name: data[name] for name in self.COLUMNS}
+            if len({len(column) for column in columns.values()}) != 1:
+                raise ValueError("columns have different lengths")
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile) as e:
+            logger.warning("Ignoring unreadable marker store %s: %s", self.path, e)
+            return
+        self._columns = columns
+
+    @staticmethod
+    def _empty():
+        return {
+            "patient": np.array([], dtype=str),
+            "date": np.array([], dtype="datetime64[D]"),
+            "analyte": np.array([], dtype=np.int16),
+            "value": np.array([], dtype=float),
+            "low": np.array([], dtype=float),
+            "high": np.array([], dtype=float),
+        }
+
+    def _save(self):
+        """Write to a temp file and swap it in, so a crash can't truncate the store."""
+        directory = os.path.dirname(self.path) or "."
+        with tempfile.NamedTemporaryFile(dir=directory, suffix=".npz", delete=False) as f:
+            try:
+                np.savez(f, **self._columns)
+            except BaseException:
+                f.close()
+                os.unlink(f.name)
+                raise
+        os.replace(f.name, self.path)
+
+    def add_report(self, patient_id, report_date, markers):
+        """
+        Store the parsed markers of one report, replacing any earlier rows for the
+        same patient, date and analyte. `markers` is the output of extract_markers;
+        markers it could not parse unambiguously (None) are not recorded.
+        """
+        parsed = {name: result for name, result in markers.items() if result is not None}
+        report_day = np.datetime64(report_date, "D")
+        new = {
+            "patient": np.array([patient_id] * len(parsed), dtype=str),
+            "date": np.full(len(parsed), report_day),
+            "analyte": np.array([ANALYTES.index(name) for name in parsed], dtype=np.int16),
+            "value": np.array([r.value for r in parsed.values()], dtype=float),
+            "low": np.array([r.low for r in parsed.values()], dtype=float),
+            "high": np.array([r.high for r in parsed.values()], dtype=float),
+        }
+        with self._lock:
+            cols = self._columns
+            keep = ~(
+                (cols["patient"] == patient_id) & (cols["date"] == report_day)
+                & np.isin(cols["analyte"], new["analyte"])
+            )
+            self._columns = {
+                name: np.concatenate([cols[name][keep], new[name]]) for name in self.COLUMNS
+            }
+            self._save()
+        return len(parsed)
+
+    def trends(self, patient_id, analytes=None):
+        """
+        Compute per-analyte trends for one patient across all stored reports.
+        Returns a list of dicts ordered as in ANALYTES.
+        """
+        with self._lock:
+            cols = self._columns
+        mask = cols["patient"] == patient_id
+        if analytes:
+            mask &= np.isin(cols["analyte"], [ANALYTES.index(a) for a in analytes if a in ANALYTES])
+        if not mask.any():
+            return []
+
+        analyte, dates = cols["analyte"][mask], cols["date"][mask]
+        value, low, high = cols["value"][mask], cols["low"][mask], cols["high"][mask]
+
+        order = np.lexsort((dates, analyte))
+        analyte, dates, value, low, high = (a[order] for a in (analyte, dates, value, low, high))
+        in_range = check_ranges(value, low, high)
+
+        groups, first, counts = np.unique(analyte, return_index=True, return_counts=True)
+        last = first + counts - 1
+        group_idx = np.repeat(np.arange(len(groups)), counts)
+
+        # Least-squares slope per analyte, in units per year
+        days = (dates - dates.min()).astype(float)
+        mean_days = np.bincount(group_idx, days) / counts
+        mean_value = np.bincount(group_idx, value) / counts
+        dx = days - mean_days[group_idx]
+        dy = value - mean_value[group_idx]
+        sxx = np.bincount(group_idx, dx * dx)
+        sxy = np.bincount(group_idx, dx * dy)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            slope_per_year = np.where(sxx > 0, sxy / sxx * 365.25, np.nan)
+            pct_change = np.where(value[first] != 0,
+                                  (value[last] - value[first]) / np.abs(value[first]) * 100, np.nan)
+
+        # Reference-range crossings between consecutive reports of the same analyte
+        crossed = np.zeros(len(value), dtype=bool)
+        crossed[1:] = (in_range[1:] != in_range[:-1]) & (analyte[1:] == analyte[:-1])
+        crossings = np.bincount(group_idx, crossed.astype(float)).astype(int)
+
+        rows = []
+        for g, analyte_code in enumerate(groups):
+            f, l = first[g], last[g]
+            rows.append({
+                "analyte": ANALYTES[analyte_code],
+                "reports": int(counts[g]),
+                "first_date": str(dates[f]),
+                "last_date": str(dates[l]),
+                "first_value": float(value[f]),
+                "last_value": float(value[l]),
+                "delta": round(float(value[l] - value[f]), 3),
+                "pct_change": None if np.isnan(pct_change[g]) else round(float(pct_change[g]), 1),
+                "slope_per_year": None if np.isnan(slope_per_year[g]) else round(float(slope_per_year[g]), 3),
+                "range": format_range(low[l], high[l]),
+                "status": "Normal" if in_range[l] else "Out of range",
+                "range_crossings": int(crossings[g]),
+            })
+        return rows
+
+def format_range(low, high):
+    if np.isnan(low) and np.isnan(high):
+        return ""
+    if np.isnan(low):
+        return f"< {high:g}"
+    if np.isnan(high):
+        return f"> {low:g}"
+    return f"{low:g} - {high:g}"
+
+def format_trend_table(rows):
+    """Render trend rows as a compact markdown table for the LLM."""
+    header = ("| Analyte | Reports | First (date) | Latest (date) | Change | Per year | "
+              "Range | Status | Range crossings |")
+    lines = [header, "|" + "---|" * 9]
+    for r in rows:
+        pct = f" ({r['pct_change']:+g}%)" if r["pct_change"] is not None else ""
+        per_year = f"{r['slope_per_year']:+g}" if r["slope_per_year"] is not None else "-"
+        lines.append(
+            f"| {r['analyte']} | {r['reports']} | {r['first_value']:g} ({r['first_date']}) | "
+            f"{r['last_value']:g} ({r['last_date']}) | {r['delta']:+g}{pct} | {per_year} | "
+            f"{r['range']} | {r['status']} | {r['range_crossings']} |"
+        )
+    return "\n".join(lines)
+
+marker_store = MarkerStore()
+
+# -----------------------------
+# INCREMENTAL RE-SUMMARIZATION
+# -----------------------------
+SUMMARY_CACHE_PATH = os.getenv(
+    "SUMMARY_CACHE_PATH", os.path.join(tempfile.gettempdir(), "lab_summary_cache.json")
+)
+SUMMARY_CACHE_MAX_DOCUMENTS = int(os.getenv("SUMMARY_CACHE_MAX_DOCUMENTS", "500"))
+SUMMARY_CACHE_MAX_SUMMARIES = int(os.getenv("SUMMARY_CACHE_MAX_SUMMARIES", "2000"))
+SUMMARY_CACHE_FLUSH_SECONDS = float(os.getenv("SUMMARY_CACHE_FLUSH_SECONDS", "2"))
+
+def page_hashes(file_path):
+    """SHA-256 of each page's extracted text, whitespace-normalised."""
+    return [
+        hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
+        for text in read_page_texts(file_path)
+    ]
+
+def document_id(hashes):
+    return hashlib.sha256("".join(hashes).encode("ascii")).hexdigest()
+
+def section_key(section, page_numbers, hashes):
+    """Cache key for a section: changes only when one of its own pages changes."""
+    parts = [section] + [hashes[i] if i < len(hashes) else "-" for i in page_numbers]
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+class SummaryCache:
+    """
+    Known documents (by per-page hashes) and section summaries keyed by the
+    hashes of the pages each section reads.
+
+    Both maps are LRU-bounded. Changes are flushed to JSON by a background timer
+    (temp file + os.replace) rather than inside the request, and an unreadable
+    cache file is treated as empty.
+    """
+
+    def __init__(self, path=SUMMARY_CACHE_PATH, max_documents=SUMMARY_CACHE_MAX_DOCUMENTS,
+                 max_summaries=SUMMARY_CACHE_MAX_SUMMARIES, flush_delay=SUMMARY_CACHE_FLUSH_SECONDS):
+        self.path = path
+        self.max_documents = max_documents
+        self.max_summaries = max_summaries
+        self.flush_delay = flush_delay
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._flush_timer = None
+        self._dirty = False
+        self._documents = OrderedDict()
+        self._summaries = OrderedDict()
+        # (page position, page hash) -> ids of documents with that page
+        self._page_index = defaultdict(set)
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            documents = OrderedDict((str(k), list(v)) for k, v in data["documents"].items())
+            summaries = OrderedDict((str(k), str(v)) for k, v in data["summaries"].items())
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            logger.warning("Ignoring unreadable summary cache %s: %s", self.path, e)
+            return
+        for doc_id, hashes in documents.items():
+            self._add_to_index(doc_id, hashes)
+        self._documents, self._summaries = documents, summaries
+        self._evict()
+
+    def _add_to_index(self, doc_id, hashes):
+        for i, page_hash in enumerate(hashes):
+            self._page_index[(i, page_hash)].add(doc_id)
+
+    def _evict(self):
+        while len(self._documents) > self.max_documents:
+            doc_id, hashes = self._documents.popitem(last=False)
+            for i, page_hash in enumerate(hashes):
+                ids = self._page_index[(i, page_hash)]
+                ids.discard(doc_id)
+                if not ids:
+                    del self._page_index[(i, page_hash)]
+        while len(self._summaries) > self.max_summaries:
+            self._summaries.popitem(last=False)
+
+    def _schedule_flush(self):
+        # Called with self._lock held
+        self._dirty = True
+        if self._flush_timer is None:
+            self._flush_timer = threading.Timer(self.flush_delay, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def flush(self):
+        """Write the cache to disk atomically."""
+        with self._lock:
+            self._flush_timer = None
+            if not self._dirty:
+                return
+            self._dirty = False
+            payload = json.dumps({"documents": self._documents, "summaries": self._summaries})
+        with self._write_lock:
+            directory = os.path.dirname(self.path) or "."
+            with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=directory,
+                                             suffix=".json", delete=False) as f:
+                f.write(payload)
+            os.replace(f.name, self.path)
+
+    def add_document(self, hashes):
+        """
+        Register a document and return the diff against the most similar known
+        document (the one sharing the most identical pages), or None.
+        """
+        doc_id = document_id(hashes)
+        with self._lock:
+            # Only documents sharing at least one page are candidates
+            shared = Counter()
+            for i, page_hash in enumerate(hashes):
+                shared.update(self._page_index.get((i, page_hash), ()))
+            previous = max(shared, key=shared.get) if shared else None
+            known_hashes = self._documents[previous] if previous else None
+
+            if doc_id not in self._documents:
+                self._add_to_index(doc_id, hashes)
+            self._documents[doc_id] = hashes
+            self._documents.move_to_end(doc_id)
+            self._evict()
+            self._schedule_flush()
+
+        if previous is None:
+            return doc_id, None
+
+        changed = [
+            i for i in range(max(len(hashes), len(known_hashes)))
+            if i >= len(hashes) or i >= len(known_hashes) or hashes[i] != known_hashes[i]
+        ]
+        refreshed = [
+            section for section, (_, pages) in SUMMARY_CONFIGS.items()
+            if set(pages) & set(changed)
+        ]
+        return doc_id, {
+            "previous_document": previous,
+            "changed_pages": changed,
+            "sections_refreshed": refreshed,
+            "sections_reused": [s for s in SUMMARY_CONFIGS if s not in refreshed],
+        }
+
+    def hashes(self, doc_id):
+        with self._lock:
+            hashes = self._documents.get(doc_id)
+            if hashes is not None:
+                self._documents.move_to_end(doc_id)
+            return hashes
+
+    def get(self, key):
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is not None:
+                self._summaries.move_to_end(key)
+            return summary
+
+    def put(self, key, summary):
+        with self._lock:
+            self._summaries[key] = summary
+            self._summaries.move_to_end(key)
+            self._evict()
+            self._schedule_flush()
+
+summary_cache = SummaryCache()
+atexit.register(summary_cache.flush)
+
+# Keys come from the file actually summarized; page_hashes is cheap as
+# read_page_texts caches the parsed pages.
+def cached_section_summary(section, file_path, page_numbers):
+    """Return the stored summary for a section if none of its pages changed."""
+    key = section_key(section, page_numbers, page_hashes(file_path))
+    summary = summary_cache.get(key)
+    if summary:
+        app.logger.info("%s: pages unchanged since a previous upload, reusing summary", section)
+    return summary
+
+def store_section_summary(section, file_path, page_numbers, summary):
+    key = section_key(section, page_numbers, page_hashes(file_path))
+    summary_cache.put(key, summary)
+
+# -----------------------------
+# REQUEST HELPERS (shared with asgi.py)
+# -----------------------------
+class RequestError(ValueError):
+    """Invalid request parameters, returned to the client as {"error": ...}."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+def upload_path():
+    """A fresh temp path for an uploaded PDF, so uploads never overwrite each other."""
+    fd, path = tempfile.mkstemp(prefix="lab_upload_", suffix=".pdf")
+    os.close(fd)
+    return path
+
+def discard_upload(path):
+    """Remove an upload saved at an upload_path() path, e.g. the session's previous one."""
+    if path and os.path.basename(path).startswith("lab_upload_"):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def upload_hashes(path):
+    """
+    Page hashes of a saved upload. If it isn't a readable PDF the file is removed
+    and RequestError is raised.
+    """
+    try:
+        return page_hashes(path)
+    except (PyPdfError, ValueError, KeyError, TypeError):
+        discard_upload(path)
+        raise RequestError("The uploaded file is not a readable PDF")
+
+def upload_response(revision):
+    response = {"message": "PDF uploaded successfully"}
+    if revision:
+        response["revision"] = revision
+    return response
+
+def report_params(form):
+    """
+    (patient_id, report_date) for recording the upload's markers, or
+    (None, None) when no patient_id was sent. report_date is required with a
+    patient_id, since backfilled reports would otherwise all land on today.
+    """
+    patient_id = form.get('patient_id')
+    if not patient_id:
+        return None, None
+    if not form.get('report_date'):
+        raise RequestError("report_date (YYYY-MM-DD) is required with patient_id")
+    try:
+        report_date = np.datetime64(form.get('report_date'), "D")
+    except ValueError:
+        raise RequestError("report_date must be YYYY-MM-DD")
+    return patient_id, report_date
+
+def trend_params(params):
+    """(patient_id, analytes or None, narrative) from /marker_trends JSON or query/form values."""
+    patient_id = params.get('patient_id')
+    if not patient_id:
+        raise RequestError("patient_id is required")
+
+    analytes = params.get('analytes')
+    if isinstance(analytes, str):
+        analytes = [a.strip() for a in analytes.split(",") if a.strip()]
+    unknown = [a for a in analytes or [] if a not in ANALYTES]
+    if unknown:
+        raise RequestError(f"Unknown analytes: {', '.join(unknown)}")
+
+    narrative = str(params.get('narrative', '')).lower() in ("1", "true", "yes")
+    return patient_id, analytes, narrative
+
+def trend_response(patient_id, analytes):
+    trends = marker_store.trends(patient_id, analytes)
+    if not trends:
+        raise RequestError("No stored reports for this patient.", 404)
+    return {"patient_id": patient_id, "trends": trends}
+
+def trend_inputs(result):
+    return {"trend_table": format_trend_table(result["trends"])}
 
 # -----------------------------
 # FLASK APP
@@ -449,12 +1401,54 @@ def upload_pdf():
     file = request.files['file']
     if not file:
         return jsonify({"error": "No file uploaded"}), 400
-    
-    temp_path = os.path.join(tempfile.gettempdir(), file.filename)
-    file.save(temp_path)
+
+    # Validate everything before the session or caches change
+    try:
+        patient_id, report_date = report_params(request.form)
+        temp_path = upload_path()
+        file.save(temp_path)
+        hashes = upload_hashes(temp_path)
+    except RequestError as e:
+        return jsonify({"error": str(e)}), e.status
+
+    discard_upload(session.get('uploaded_pdf'))
     session['uploaded_pdf'] = temp_path
 
-    return jsonify({"message": "PDF uploaded successfully"})
+    # Per-page hashes let a corrected re-issue reuse unchanged section summaries
+    _, revision = summary_cache.add_document(hashes)
+    session['revision_diff'] = revision
+    response = upload_response(revision)
+
+    # Optionally record the report's marker values for trend analysis
+    if patient_id:
+        markers = extract_markers(extract_all_text(temp_path), ANALYTES)
+        response["markers_recorded"] = marker_store.add_report(patient_id, report_date, markers)
+
+    return jsonify(response)
+
+@app.route('/revision_diff', methods=['GET'])
+def revision_diff():
+    if not session.get('uploaded_pdf'):
+        return jsonify({"error": "No PDF uploaded. Please upload first."}), 400
+    return jsonify({"revision": session.get('revision_diff')})
+
+# -----------------------------
+# Marker trends across a patient's reports
+# -----------------------------
+@app.route('/marker_trends', methods=['GET', 'POST'])
+def marker_trends():
+    try:
+        patient_id, analytes, narrative = trend_params(request.get_json(silent=True) or request.values)
+        result = trend_response(patient_id, analytes)
+    except RequestError as e:
+        return jsonify({"error": str(e)}), e.status
+
+    if narrative:
+        chain = TREND_PROMPT | get_llm()
+        summary = chain.invoke(trend_inputs(result))
+        result["summary"] = summary.content.strip()
+
+    return jsonify(result)
 
 # -----------------------------
 # Diabetes / Prediabetes
@@ -466,20 +1460,23 @@ def summarize_diabetes():
         return jsonify({"error": "No PDF uploaded. Please upload first."}), 400
     
     relevant_pages = [1, 3, 4, 12]
-    text = extract_pages(file_path, relevant_pages)
+    cached = cached_section_summary("Diabetes", file_path, relevant_pages)
+    if cached:
+        return jsonify({"summary": cached, "cached": True})
 
-    embeddings = init_embeddings(os.getenv("HF_API_TOKEN"))
-    texts = text.split("\n\n")
-    vectorstore = FAISS.from_texts(texts, embeddings)
+    fast_summary = section_fast_path("Diabetes", file_path, relevant_pages)
+    if fast_summary:
+        return jsonify({"summary": fast_summary, "llm_skipped": True})
 
-    all_docs = vectorstore.similarity_search("", k=len(texts))
-    context = "\n\n".join([d.page_content for d in all_docs])
+    embeddings = get_embeddings()
+    context, chunking = build_context(file_path, relevant_pages, embeddings)
 
-    llm = init_llm(os.getenv("GOOGLE_API_KEY"))
+    llm = get_llm()
     chain = SUMMARY_PROMPT_DIABETES | llm
     summary = chain.invoke({"context": context})
+    store_section_summary("Diabetes", file_path, relevant_pages, summary.content.strip())
 
-    return jsonify({"summary": summary.content})
+    return jsonify({"summary": summary.content.strip(), "chunking": chunking})
 
 @app.route('/summarize_hypertension', methods=['POST'])
 def summarize_hypertension():
@@ -488,20 +1485,23 @@ def summarize_hypertension():
         return jsonify({"error": "No PDF uploaded. Please upload first."}), 400
 
     relevant_pages = [3, 4, 8, 9, 12] 
-    text = extract_pages(file_path, relevant_pages)
+    cached = cached_section_summary("Hypertension", file_path, relevant_pages)
+    if cached:
+        return jsonify({"summary": cached, "cached": True})
 
-    embeddings = init_embeddings(os.getenv("HF_API_TOKEN"))
-    texts = text.split("\n\n")
-    vectorstore = FAISS.from_texts(texts, embeddings)
+    fast_summary = section_fast_path("Hypertension", file_path, relevant_pages)
+    if fast_summary:
+        return jsonify({"summary": fast_summary, "llm_skipped": True})
 
-    all_docs = vectorstore.similarity_search("", k=len(texts))
-    context = "\n\n".join([d.page_content for d in all_docs])
+    embeddings = get_embeddings()
+    context, chunking = build_context(file_path, relevant_pages, embeddings)
 
-    llm = init_llm(os.getenv("GOOGLE_API_KEY"))
+    llm = get_llm()
     chain = SUMMARY_PROMPT_HYPERTENSION | llm
     summary = chain.invoke({"context": context})
+    store_section_summary("Hypertension", file_path, relevant_pages, summary.content.strip())
 
-    return jsonify({"summary": summary.content.strip()})
+    return jsonify({"summary": summary.content.strip(), "chunking": chunking})
 
 @app.route('/summarize_dyslipidemia', methods=['POST'])
 def summarize_dyslipidemia():
@@ -510,20 +1510,23 @@ def summarize_dyslipidemia():
         return jsonify({"error": "No PDF uploaded. Please upload first."}), 400
 
     relevant_pages = [4, 5, 6, 8, 9, 12]  
-    text = extract_pages(file_path, relevant_pages)
+    cached = cached_section_summary("Dyslipidemia", file_path, relevant_pages)
+    if cached:
+        return jsonify({"summary": cached, "cached": True})
 
-    embeddings = init_embeddings(os.getenv("HF_API_TOKEN"))
-    texts = text.split("\n\n")
-    vectorstore = FAISS.from_texts(texts, embeddings)
+    fast_summary = section_fast_path("Dyslipidemia", file_path, relevant_pages)
+    if fast_summary:
+        return jsonify({"summary": fast_summary, "llm_skipped": True})
 
-    all_docs = vectorstore.similarity_search("", k=len(texts))
-    context = "\n\n".join([d.page_content for d in all_docs])
+    embeddings = get_embeddings()
+    context, chunking = build_context(file_path, relevant_pages, embeddings)
 
-    llm = init_llm(os.getenv("GOOGLE_API_KEY"))
+    llm = get_llm()
     chain = SUMMARY_PROMPT_DYSLIPIDEMIA | llm
     summary = chain.invoke({"context": context})
+    store_section_summary("Dyslipidemia", file_path, relevant_pages, summary.content.strip())
 
-    return jsonify({"summary": summary.content.strip()})
+    return jsonify({"summary": summary.content.strip(), "chunking": chunking})
 
 @app.route('/summarize_liver', methods=['POST'])
 def summarize_liver():
@@ -532,20 +1535,23 @@ def summarize_liver():
         return jsonify({"error": "No PDF uploaded. Please upload first."}), 400
 
     relevant_pages = [5, 7, 10, 11] 
-    text = extract_pages(file_path, relevant_pages)
+    cached = cached_section_summary("Liver", file_path, relevant_pages)
+    if cached:
+        return jsonify({"summary": cached, "cached": True})
 
-    embeddings = init_embeddings(os.getenv("HF_API_TOKEN"))
-    texts = text.split("\n\n")
-    vectorstore = FAISS.from_texts(texts, embeddings)
+    fast_summary = section_fast_path("Liver", file_path, relevant_pages)
+    if fast_summary:
+        return jsonify({"summary": fast_summary, "llm_skipped": True})
 
-    all_docs = vectorstore.similarity_search("", k=len(texts))
-    context = "\n\n".join([d.page_content for d in all_docs])
+    embeddings = get_embeddings()
+    context, chunking = build_context(file_path, relevant_pages, embeddings)
 
-    llm = init_llm(os.getenv("GOOGLE_API_KEY"))
+    llm = get_llm()
     chain = SUMMARY_PROMPT_LIVER | llm
     summary = chain.invoke({"context": context})
+    store_section_summary("Liver", file_path, relevant_pages, summary.content.strip())
 
-    return jsonify({"summary": summary.content.strip()})
+    return jsonify({"summary": summary.content.strip(), "chunking": chunking})
 
 @app.route('/summarize_kidney', methods=['POST'])
 def summarize_kidney():
@@ -554,20 +1560,23 @@ def summarize_kidney():
         return jsonify({"error": "No PDF uploaded. Please upload first."}), 400
 
     relevant_pages = [3, 7, 8, 9]  
-    text = extract_pages(file_path, relevant_pages)
+    cached = cached_section_summary("Kidney", file_path, relevant_pages)
+    if cached:
+        return jsonify({"summary": cached, "cached": True})
 
-    embeddings = init_embeddings(os.getenv("HF_API_TOKEN"))
-    texts = text.split("\n\n")
-    vectorstore = FAISS.from_texts(texts, embeddings)
+    fast_summary = section_fast_path("Kidney", file_path, relevant_pages)
+    if fast_summary:
+        return jsonify({"summary": fast_summary, "llm_skipped": True})
 
-    all_docs = vectorstore.similarity_search("", k=len(texts))
-    context = "\n\n".join([d.page_content for d in all_docs])
+    embeddings = get_embeddings()
+    context, chunking = build_context(file_path, relevant_pages, embeddings)
 
-    llm = init_llm(os.getenv("GOOGLE_API_KEY"))
+    llm = get_llm()
     chain = SUMMARY_PROMPT_KIDNEY | llm
     summary = chain.invoke({"context": context})
+    store_section_summary("Kidney", file_path, relevant_pages, summary.content.strip())
 
-    return jsonify({"summary": summary.content.strip()})
+    return jsonify({"summary": summary.content.strip(), "chunking": chunking})
 
 @app.route('/summarize_thyroid', methods=['POST'])
 def summarize_thyroid():
@@ -576,20 +1585,23 @@ def summarize_thyroid():
         return jsonify({"error": "No PDF uploaded. Please upload first."}), 400
 
     relevant_pages = [3, 7, 10, 22]  
-    text = extract_pages(file_path, relevant_pages)
+    cached = cached_section_summary("Thyroid", file_path, relevant_pages)
+    if cached:
+        return jsonify({"summary": cached, "cached": True})
 
-    embeddings = init_embeddings(os.getenv("HF_API_TOKEN"))
-    texts = text.split("\n\n")
-    vectorstore = FAISS.from_texts(texts, embeddings)
+    fast_summary = section_fast_path("Thyroid", file_path, relevant_pages)
+    if fast_summary:
+        return jsonify({"summary": fast_summary, "llm_skipped": True})
 
-    all_docs = vectorstore.similarity_search("", k=len(texts))
-    context = "\n\n".join([d.page_content for d in all_docs])
+    embeddings = get_embeddings()
+    context, chunking = build_context(file_path, relevant_pages, embeddings)
 
-    llm = init_llm(os.getenv("GOOGLE_API_KEY"))
+    llm = get_llm()
     chain = SUMMARY_PROMPT_THYROID | llm
     summary = chain.invoke({"context": context})
+    store_section_summary("Thyroid", file_path, relevant_pages, summary.content.strip())
 
-    return jsonify({"summary": summary.content.strip()})
+    return jsonify({"summary": summary.content.strip(), "chunking": chunking})
 
 @app.route('/summarize_anemia', methods=['POST'])
 def summarize_anemia():
@@ -598,20 +1610,23 @@ def summarize_anemia():
         return jsonify({"error": "No PDF uploaded. Please upload first."}), 400
 
     relevant_pages = [1, 5, 6, 7, 10]  
-    text = extract_pages(file_path, relevant_pages)
+    cached = cached_section_summary("Anemia", file_path, relevant_pages)
+    if cached:
+        return jsonify({"summary": cached, "cached": True})
 
-    embeddings = init_embeddings(os.getenv("HF_API_TOKEN"))
-    texts = text.split("\n\n")
-    vectorstore = FAISS.from_texts(texts, embeddings)
+    fast_summary = section_fast_path("Anemia", file_path, relevant_pages)
+    if fast_summary:
+        return jsonify({"summary": fast_summary, "llm_skipped": True})
 
-    all_docs = vectorstore.similarity_search("", k=len(texts))
-    context = "\n\n".join([d.page_content for d in all_docs])
+    embeddings = get_embeddings()
+    context, chunking = build_context(file_path, relevant_pages, embeddings)
 
-    llm = init_llm(os.getenv("GOOGLE_API_KEY"))
+    llm = get_llm()
     chain = SUMMARY_PROMPT_ANEMIA | llm
     summary = chain.invoke({"context": context})
+    store_section_summary("Anemia", file_path, relevant_pages, summary.content.strip())
 
-    return jsonify({"summary": summary.content.strip()})
+    return jsonify({"summary": summary.content.strip(), "chunking": chunking})
 
 @app.route('/summarize_obesity', methods=['POST'])
 def summarize_obesity():
@@ -620,20 +1635,23 @@ def summarize_obesity():
         return jsonify({"error": "No PDF uploaded. Please upload first."}), 400
 
     relevant_pages = [1, 3, 4, 5, 7, 8, 12]  
-    text = extract_pages(file_path, relevant_pages)
+    cached = cached_section_summary("Obesity", file_path, relevant_pages)
+    if cached:
+        return jsonify({"summary": cached, "cached": True})
 
-    embeddings = init_embeddings(os.getenv("HF_API_TOKEN"))
-    texts = text.split("\n\n")
-    vectorstore = FAISS.from_texts(texts, embeddings)
+    fast_summary = section_fast_path("Obesity", file_path, relevant_pages)
+    if fast_summary:
+        return jsonify({"summary": fast_summary, "llm_skipped": True})
 
-    all_docs = vectorstore.similarity_search("", k=len(texts))
-    context = "\n\n".join([d.page_content for d in all_docs])
+    embeddings = get_embeddings()
+    context, chunking = build_context(file_path, relevant_pages, embeddings)
 
-    llm = init_llm(os.getenv("GOOGLE_API_KEY"))
+    llm = get_llm()
     chain = SUMMARY_PROMPT_OBESITY | llm
     summary = chain.invoke({"context": context})
+    store_section_summary("Obesity", file_path, relevant_pages, summary.content.strip())
 
-    return jsonify({"summary": summary.content.strip()})
+    return jsonify({"summary": summary.content.strip(), "chunking": chunking})
 
 @app.route('/summarize_nutrition', methods=['POST'])
 def summarize_nutrition():
@@ -642,20 +1660,23 @@ def summarize_nutrition():
         return jsonify({"error": "No PDF uploaded. Please upload first."}), 400
 
     relevant_pages = [3, 5, 7, 10]  
-    text = extract_pages(file_path, relevant_pages)
+    cached = cached_section_summary("Nutrition", file_path, relevant_pages)
+    if cached:
+        return jsonify({"summary": cached, "cached": True})
 
-    embeddings = init_embeddings(os.getenv("HF_API_TOKEN"))
-    texts = text.split("\n\n")
-    vectorstore = FAISS.from_texts(texts, embeddings)
+    fast_summary = section_fast_path("Nutrition", file_path, relevant_pages)
+    if fast_summary:
+        return jsonify({"summary": fast_summary, "llm_skipped": True})
 
-    all_docs = vectorstore.similarity_search("", k=len(texts))
-    context = "\n\n".join([d.page_content for d in all_docs])
+    embeddings = get_embeddings()
+    context, chunking = build_context(file_path, relevant_pages, embeddings)
 
-    llm = init_llm(os.getenv("GOOGLE_API_KEY"))
+    llm = get_llm()
     chain = SUMMARY_PROMPT_NUTRITION | llm
     summary = chain.invoke({"context": context})
+    store_section_summary("Nutrition", file_path, relevant_pages, summary.content.strip())
 
-    return jsonify({"summary": summary.content.strip()})
+    return jsonify({"summary": summary.content.strip(), "chunking": chunking})
 
 def generate_summary_pdf(summaries, output_file):
     doc = SimpleDocTemplate(output_file, pagesize=A4)
@@ -726,24 +1747,45 @@ def summarize_all():
         return jsonify({"error": "No PDF uploaded. Please upload first."}), 400
 
     summaries = {}
-    embeddings = init_embeddings(os.getenv("HF_API_TOKEN"))
-    llm = init_llm(os.getenv("GOOGLE_API_KEY"))
+    embeddings = get_embeddings()
+    llm = get_llm()
+
+    llm_calls_saved = 0
+    refreshed = []
 
     for section, (prompt, pages) in SUMMARY_CONFIGS.items():
-        text = extract_pages(file_path, pages)
-        texts = text.split("\n\n")
-        vectorstore = FAISS.from_texts(texts, embeddings)
-        all_docs = vectorstore.similarity_search("", k=len(texts))
-        context = "\n\n".join([d.page_content for d in all_docs])
+        cached = cached_section_summary(section, file_path, pages)
+        if cached:
+            summaries[section] = cached
+            continue
+
+        fast_summary = section_fast_path(section, file_path, pages)
+        if fast_summary:
+            summaries[section] = fast_summary
+            llm_calls_saved += 1
+            continue
+
+        refreshed.append(section)
+
+        context, _ = build_context(file_path, pages, embeddings)
 
         chain = prompt | llm
         summary = chain.invoke({"context": context})
         summaries[section] = summary.content.strip()
-
-    temp_pdf = os.path.join(tempfile.gettempdir(), "lab_report_summary.pdf")
-    generate_summary_pdf(summaries, temp_pdf)
-
-    return send_file(temp_pdf, as_attachment=True, download_name="Lab_Report_Summary.pdf")
+        store_section_summary(section, file_path, pages, summaries[section])
+
+    # Built in memory so concurrent requests never share a file
+    summary_pdf = io.BytesIO()
+    generate_summary_pdf(summaries, summary_pdf)
+    summary_pdf.seek(0)
+
+    app.logger.info("summarize_all: %d of %d LLM calls saved by the normal-result fast path",
+                    llm_calls_saved, len(SUMMARY_CONFIGS))
+    response = send_file(summary_pdf, mimetype="application/pdf", as_attachment=True,
+                         download_name="Lab_Report_Summary.pdf")
+    response.headers["X-LLM-Calls-Saved"] = str(llm_calls_saved)
+    response.headers["X-Sections-Refreshed"] = ", ".join(refreshed)
+    return response
 
 # -----------------------------
 # ENTRY POINT
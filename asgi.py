@@ -0,0 +1,178 @@
+"""
+Async (ASGI) serving mode for the Lab Report Summarizer.
+
+Same endpoints as app.py, but LLM and embedding calls are awaited
+(`ainvoke` / `aembed_documents`) and PDF parsing, PDF generation and store
+writes run off the event loop, so one worker can hold many in-flight summaries.
+The Gemini and embedding clients are created once per process and shared.
+
+Run with:  hypercorn asgi:app --bind 0.0.0.0:5000
+"""
+import asyncio
+import io
+import os
+import time
+
+from quart import Quart, request, render_template, jsonify, session, send_file
+from langchain_community.vectorstores import FAISS
+
+from app import (
+    ANALYTES, SUMMARY_CONFIGS, TREND_PROMPT, RequestError,
+    get_llm, get_embeddings, extract_all_text, extract_page_texts, chunk_pages,
+    chunking_stats, normal_fast_path, extract_markers, page_hashes, section_key,
+    summary_cache, marker_store, generate_summary_pdf,
+    upload_path, discard_upload, upload_hashes, upload_response, report_params, trend_params, trend_response, trend_inputs,
+)
+from app import app as flask_app
+
+# -----------------------------
+# ASYNC HELPERS
+# -----------------------------
+async def abuild_context(pages, page_numbers, embeddings):
+    """Async counterpart of app.build_context for already-extracted pages."""
+    texts, metadatas = chunk_pages(pages)
+    if not texts:
+        texts, metadatas = [""], [{"page": None, "chunk": 0}]
+
+    start = time.perf_counter()
+    vectors = await embeddings.aembed_documents(texts)
+    embed_seconds = time.perf_counter() - start
+
+    vectorstore = FAISS.from_embeddings(list(zip(texts, vectors)), embeddings, metadatas=metadatas)
+    query = await embeddings.aembed_query("")
+    all_docs = await vectorstore.asimilarity_search_by_vector(query, k=len(texts))
+    context = "\n\n".join([d.page_content for d in all_docs])
+
+    return context, chunking_stats(page_numbers, pages, texts, embed_seconds)
+
+async def summarize_section(section, file_path, hashes, embeddings, llm):
+    """Cached summary, then the normal-result fast path, then the LLM."""
+    prompt, relevant_pages = SUMMARY_CONFIGS[section]
+    key = section_key(section, relevant_pages, hashes)
+    cached = summary_cache.get(key)
+    if cached:
+        return {"summary": cached, "cached": True}
+
+    pages = await asyncio.to_thread(extract_page_texts, file_path, relevant_pages)
+    fast_summary = normal_fast_path(section, "\n".join(text for _, text in pages))
+    if fast_summary:
+        return {"summary": fast_summary, "llm_skipped": True}
+
+    context, chunking = await abuild_context(pages, relevant_pages, embeddings)
+
+    chain = prompt | llm
+    summary = await chain.ainvoke({"context": context})
+    content = summary.content.strip()
+    await asyncio.to_thread(summary_cache.put, key, content)
+
+    return {"summary": content, "chunking": chunking}
+
+# -----------------------------
+# QUART APP
+# -----------------------------
+app = Quart(__name__)
+app.secret_key = flask_app.secret_key
+
+SECTION_ROUTES = {section.lower(): section for section in SUMMARY_CONFIGS}
+
+@app.route('/')
+async def index():
+    return await render_template('index.html')
+
+@app.route('/upload_pdf', methods=['POST'])
+async def upload_pdf():
+    file = (await request.files).get('file')
+    if not file:
+        return jsonify({"error": "No file uploaded"}), 400
+
+    # Validate everything before the session or caches change
+    try:
+        patient_id, report_date = report_params(await request.form)
+        temp_path = await asyncio.to_thread(upload_path)
+        await file.save(temp_path)
+        hashes = await asyncio.to_thread(upload_hashes, temp_path)
+    except RequestError as e:
+        return jsonify({"error": str(e)}), e.status
+
+    await asyncio.to_thread(discard_upload, session.get('uploaded_pdf'))
+    session['uploaded_pdf'] = temp_path
+
+    _, revision = await asyncio.to_thread(summary_cache.add_document, hashes)
+    session['revision_diff'] = revision
+    response = upload_response(revision)
+
+    if patient_id:
+        text = await asyncio.to_thread(extract_all_text, temp_path)
+        markers = extract_markers(text, ANALYTES)
+        response["markers_recorded"] = await asyncio.to_thread(
+            marker_store.add_report, patient_id, report_date, markers
+        )
+
+    return jsonify(response)
+
+@app.route('/revision_diff', methods=['GET'])
+async def revision_diff():
+    if not session.get('uploaded_pdf'):
+        return jsonify({"error": "No PDF uploaded. Please upload first."}), 400
+    return jsonify({"revision": session.get('revision_diff')})
+
+@app.route('/marker_trends', methods=['GET', 'POST'])
+async def marker_trends():
+    try:
+        patient_id, analytes, narrative = trend_params(await request.get_json(silent=True) or await request.values)
+        result = trend_response(patient_id, analytes)
+    except RequestError as e:
+        return jsonify({"error": str(e)}), e.status
+
+    if narrative:
+        chain = TREND_PROMPT | get_llm()
+        summary = await chain.ainvoke(trend_inputs(result))
+        result["summary"] = summary.content.strip()
+
+    return jsonify(result)
+
+@app.route('/summarize_<name>', methods=['POST'])
+async def summarize(name):
+    section = SECTION_ROUTES.get(name)
+    if not section:
+        return jsonify({"error": f"Unknown summary type: {name}"}), 404
+
+    file_path = session.get('uploaded_pdf')
+    if not file_path or not os.path.exists(file_path):
+        return jsonify({"error": "No PDF uploaded. Please upload first."}), 400
+
+    # Cache keys come from the file actually summarized
+    hashes = await asyncio.to_thread(page_hashes, file_path)
+    embeddings, llm = get_embeddings(), get_llm()
+
+    return jsonify(await summarize_section(section, file_path, hashes, embeddings, llm))
+
+@app.route('/summarize_all', methods=['GET', 'POST'])
+async def summarize_all():
+    file_path = session.get('uploaded_pdf')
+    if not file_path or not os.path.exists(file_path):
+        return jsonify({"error": "No PDF uploaded. Please upload first."}), 400
+
+    # Cache keys come from the file actually summarized
+    hashes = await asyncio.to_thread(page_hashes, file_path)
+    embeddings, llm = get_embeddings(), get_llm()
+
+    # All sections are independent, so they are summarized concurrently
+    results = await asyncio.gather(*(
+        summarize_section(section, file_path, hashes, embeddings, llm)
+        for section in SUMMARY_CONFIGS
+    ))
+    summaries = {section: r["summary"] for section, r in zip(SUMMARY_CONFIGS, results)}
+    llm_calls_saved = sum(1 for r in results if r.get("llm_skipped"))
+    refreshed = [section for section, r in zip(SUMMARY_CONFIGS, results) if "chunking" in r]
+
+    # Built in memory so concurrent requests never share a file
+    summary_pdf = io.BytesIO()
+    await asyncio.to_thread(generate_summary_pdf, summaries, summary_pdf)
+    summary_pdf.seek(0)
+
+    response = await send_file(summary_pdf, mimetype="application/pdf", as_attachment=True,
+                               attachment_filename="Lab_Report_Summary.pdf")
+    response.headers["X-LLM-Calls-Saved"] = str(llm_calls_saved)
+    response.headers["X-Sections-Refreshed"] = ", ".join(refreshed)
+    return response
@@ -0,0 +1,45 @@
+"""
+One-off comparison of the old blank-line split against the token-bounded chunker.
+
+For every condition in SUMMARY_CONFIGS, both chunkings of a report are embedded
+with the configured HuggingFace endpoint (HF_API_TOKEN) and the chunk counts,
+largest chunk and embedding time are printed side by side.
+
+    python compare_chunking.py path/to/report.pdf
+"""
+import argparse
+import os
+import time
+
+from app import SUMMARY_CONFIGS, init_embeddings, extract_page_texts, chunk_pages, count_tokens
+
+def timed_embed(embeddings, texts):
+    start = time.perf_counter()
+    embeddings.embed_documents(texts)
+    return time.perf_counter() - start
+
+def main(args):
+    embeddings = init_embeddings(os.getenv("HF_API_TOKEN"))
+
+    print(f"{'section':<13} {'old chunks':>10} {'old max tok':>11} {'old embed s':>11} "
+          f"{'new chunks':>10} {'new max tok':>11} {'new embed s':>11}")
+    totals = [0, 0.0, 0, 0.0]
+    for section, (_, page_numbers) in SUMMARY_CONFIGS.items():
+        pages = extract_page_texts(args.pdf, page_numbers)
+        legacy = "\n".join(text for _, text in pages).split("\n\n")
+        chunks, _ = chunk_pages(pages)
+
+        legacy_seconds = timed_embed(embeddings, legacy)
+        chunk_seconds = timed_embed(embeddings, chunks) if chunks else 0.0
+        totals = [totals[0] + len(legacy), totals[1] + legacy_seconds,
+                  totals[2] + len(chunks), totals[3] + chunk_seconds]
+
+        print(f"{section:<13} {len(legacy):>10} {max(map(count_tokens, legacy)):>11} {legacy_seconds:>11.3f} "
+              f"{len(chunks):>10} {max(map(count_tokens, chunks), default=0):>11} {chunk_seconds:>11.3f}")
+
+    print(f"{'total':<13} {totals[0]:>10} {'':>11} {totals[1]:>11.3f} {totals[2]:>10} {'':>11} {totals[3]:>11.3f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare old and new chunking of a lab report")
+    parser.add_argument("pdf")
+    main(parser.parse_args())
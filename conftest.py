@@ -0,0 +1 @@
+# Lets the tests import app.py from the project root.
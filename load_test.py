@@ -0,0 +1,146 @@
+"""
+Local load test for the async serving mode (asgi.py) against stub backends.
+
+Gemini and the HuggingFace embeddings are replaced by stubs that just sleep
+for a configurable latency. The summary cache and normal-result fast path are
+bypassed so every request does the full embed + LLM round trip. Requests go
+through the ASGI app in-process, so no network or API keys are needed.
+
+    python load_test.py --concurrency 1 10 50 100 200 400 --llm-latency 1.0
+"""
+import argparse
+import asyncio
+import io
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+# Keep the stores out of the real temp-dir files before app.py reads these
+_tmp = tempfile.mkdtemp(prefix="lab_load_test_")
+os.environ["SUMMARY_CACHE_PATH"] = os.path.join(_tmp, "summary_cache.json")
+os.environ["MARKER_STORE_PATH"] = os.path.join(_tmp, "marker_store.npz")
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+from quart.datastructures import FileStorage
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+import asgi
+
+# -----------------------------
+# STUB BACKENDS
+# -----------------------------
+class StubEmbeddings(Embeddings):
+    def __init__(self, latency, dim=384):
+        self.latency = latency
+        self.dim = dim
+
+    def _vector(self, text):
+        return np.random.default_rng(abs(hash(text)) % 2**32).random(self.dim).tolist()
+
+    def embed_documents(self, texts):
+        time.sleep(self.latency)
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        time.sleep(self.latency)
+        return self._vector(text)
+
+    async def aembed_documents(self, texts):
+        await asyncio.sleep(self.latency)
+        return [self._vector(t) for t in texts]
+
+    async def aembed_query(self, text):
+        await asyncio.sleep(self.latency)
+        return self._vector(text)
+
+def stub_llm(latency):
+    def invoke(prompt_value):
+        time.sleep(latency)
+        return AIMessage(content="### Conclusion\nStub summary.")
+
+    async def ainvoke(prompt_value):
+        await asyncio.sleep(latency)
+        return AIMessage(content="### Conclusion\nStub summary.")
+
+    return RunnableLambda(invoke, afunc=ainvoke)
+
+def install_stubs(llm_latency, embed_latency):
+    llm, embeddings = stub_llm(llm_latency), StubEmbeddings(embed_latency)
+    asgi.get_llm = lambda: llm
+    asgi.get_embeddings = lambda: embeddings
+    asgi.normal_fast_path = lambda section, text: None
+    asgi.summary_cache.get = lambda key: None
+    asgi.summary_cache.put = lambda key, summary: None
+
+def sample_pdf(pages=23):
+    """A synthetic report long enough for every page in SUMMARY_CONFIGS."""
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    for page in range(pages):
+        y = 800
+        for marker in asgi.ANALYTES:
+            pdf.drawString(40, y, f"{marker} {random.uniform(1, 200):.1f} mg/dL 10 - 100 (page {page})")
+            y -= 18
+        pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+# -----------------------------
+# LOAD TEST
+# -----------------------------
+async def run_level(client, concurrency, total):
+    semaphore = asyncio.Semaphore(concurrency)
+    sections = list(asgi.SECTION_ROUTES)
+    latencies = []
+
+    async def one_request(i):
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post(f"/summarize_{sections[i % len(sections)]}")
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                raise RuntimeError(f"Request failed with {response.status_code}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one_request(i) for i in range(total)))
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array(latencies)
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "p50": np.percentile(latencies, 50),
+        "p99": np.percentile(latencies, 99),
+        "throughput": total / elapsed,
+    }
+
+async def main(args):
+    install_stubs(args.llm_latency, args.embed_latency)
+    client = asgi.app.test_client()
+
+    pdf = FileStorage(io.BytesIO(sample_pdf()), filename="load_test_report.pdf")
+    response = await client.post("/upload_pdf", files={"file": pdf})
+    if response.status_code != 200:
+        raise RuntimeError("Upload failed")
+
+    print(f"Stub latency: LLM {args.llm_latency:.2f}s, embeddings {args.embed_latency:.2f}s x2 per request")
+    print(f"{'concurrency':>11} {'requests':>9} {'p50 (s)':>9} {'p99 (s)':>9} {'req/s':>9}")
+    for concurrency in args.concurrency:
+        total = max(concurrency * args.rounds, args.min_requests)
+        r = await run_level(client, concurrency, total)
+        print(f"{r['concurrency']:>11} {r['requests']:>9} {r['p50']:>9.3f} {r['p99']:>9.3f} {r['throughput']:>9.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the async serving mode with stub backends")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50, 100, 200, 400])
+    parser.add_argument("--rounds", type=int, default=3, help="requests per concurrent client")
+    parser.add_argument("--min-requests", type=int, default=20)
+    parser.add_argument("--llm-latency", type=float, default=1.0)
+    parser.add_argument("--embed-latency", type=float, default=0.1)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,77 @@
+import pytest
+
+from app import chunk_pages, count_tokens
+
+
+def lab_lines(n, prefix="Marker"):
+    return [f"{prefix} {i} value {i}.5 mg/dL 1 - 10" for i in range(n)]
+
+
+def test_count_tokens_splits_numbers_and_punctuation():
+    assert count_tokens("HbA1c 5.2 % 4.0 - 5.6") == 12
+
+
+def test_chunks_respect_token_bound():
+    texts, _ = chunk_pages([(1, "\n".join(lab_lines(40)))], max_tokens=50, overlap_tokens=10)
+
+    assert len(texts) > 1
+    assert all(count_tokens(text) <= 50 for text in texts)
+
+
+def test_consecutive_chunks_overlap():
+    texts, _ = chunk_pages([(1, "\n".join(lab_lines(40)))], max_tokens=50, overlap_tokens=15)
+
+    for previous, current in zip(texts, texts[1:]):
+        last_line = previous.split("\n")[-1]
+        assert current.split("\n")[0] == last_line
+        assert count_tokens(last_line) <= 15
+
+
+def test_no_overlap_when_budget_is_zero():
+    lines = lab_lines(40)
+    texts, _ = chunk_pages([(1, "\n".join(lines))], max_tokens=50, overlap_tokens=0)
+
+    assert [line for text in texts for line in text.split("\n")] == lines
+
+
+def test_overlong_line_is_split_on_words():
+    line = " ".join(f"word{i}" for i in range(100))
+    texts, _ = chunk_pages([(1, line)], max_tokens=30, overlap_tokens=5)
+
+    assert len(texts) > 1
+    assert all(count_tokens(text) <= 30 for text in texts)
+    words = [w for text in texts for w in text.split()]
+    assert set(words) == set(line.split())
+    assert words[:30] == line.split()[:30]
+
+
+def test_chunks_never_span_pages():
+    pages = [(3, "\n".join(lab_lines(2, "Alpha"))), (7, "\n".join(lab_lines(2, "Beta")))]
+    texts, metadatas = chunk_pages(pages, max_tokens=200, overlap_tokens=20)
+
+    assert len(texts) == 2
+    assert "Beta" not in texts[0] and "Alpha" not in texts[1]
+    assert metadatas == [{"page": 3, "chunk": 0}, {"page": 7, "chunk": 1}]
+
+
+def test_page_metadata_follows_each_chunk():
+    pages = [(1, "\n".join(lab_lines(30, "Alpha"))), (4, "\n".join(lab_lines(30, "Beta")))]
+    texts, metadatas = chunk_pages(pages, max_tokens=60, overlap_tokens=10)
+
+    assert [m["chunk"] for m in metadatas] == list(range(len(texts)))
+    for text, metadata in zip(texts, metadatas):
+        assert metadata["page"] == (1 if "Alpha" in text else 4)
+        assert ("Alpha" in text) != ("Beta" in text)
+
+
+def test_blank_lines_and_empty_pages_are_skipped():
+    texts, metadatas = chunk_pages([(1, "\n\n  \n"), (2, "\nSodium 140 mmol/L 135 - 145\n\n")])
+
+    assert texts == ["Sodium 140 mmol/L 135 - 145"]
+    assert metadatas == [{"page": 2, "chunk": 0}]
+
+
+@pytest.mark.parametrize("overlap", [50, 60])
+def test_overlap_must_be_smaller_than_chunk_size(overlap):
+    with pytest.raises(ValueError, match="smaller than the chunk size"):
+        chunk_pages([(1, "Sodium 140")], max_tokens=50, overlap_tokens=overlap)
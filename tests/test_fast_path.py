@@ -0,0 +1,171 @@
+import pytest
+
+from app import check_ranges, extract_markers, normal_fast_path
+
+
+def parse(line, marker):
+    return extract_markers(line, [marker]).get(marker)
+
+
+# -----------------------------
+# Tiered reference ranges
+# -----------------------------
+def test_tiered_hba1c_range_is_not_parsed():
+    line = "HbA1c 6.1 % Non-diabetic: < 5.7 Prediabetic: 5.7 - 6.4 Diabetic: >= 6.5"
+    assert parse(line, "HbA1c") is None
+
+
+def test_tiered_cholesterol_range_is_not_parsed():
+    line = "Total Cholesterol 225 mg/dL Desirable < 200 Borderline 200 - 239 High >= 240"
+    assert parse(line, "Total Cholesterol") is None
+
+
+def test_single_labelled_band_is_not_parsed():
+    assert parse("Total Cholesterol 180 mg/dL Desirable < 200", "Total Cholesterol") is None
+
+
+def test_tiered_ranges_send_section_to_llm():
+    text = (
+        "HbA1c 6.1 % Non-diabetic: < 5.7 Prediabetic: 5.7 - 6.4 Diabetic: >= 6.5\n"
+        "Fasting Blood Sugar 88 mg/dL 70 - 100"
+    )
+    assert normal_fast_path("Diabetes", text) is None
+
+
+# -----------------------------
+# Value anchoring
+# -----------------------------
+def test_digits_in_test_name_are_not_the_value():
+    result = parse("TSH 3rd generation 6.2 uIU/mL 0.4 - 4.2", "TSH")
+    assert result.value == 6.2
+    assert result.value_text == "6.2 uIU/mL"
+
+
+def test_high_tsh_with_generation_in_name_goes_to_llm():
+    text = "TSH 3rd generation 6.2 uIU/mL 0.4 - 4.2\nFree T4 1.2 ng/dL 0.8 - 1.8"
+    assert normal_fast_path("Thyroid", text) is None
+
+
+def test_marker_names_with_digits():
+    assert parse("HbA1c 5.4 % 4.0 - 5.6", "HbA1c").value == 5.4
+    assert parse("Free T4 1.2 ng/dL 0.8 - 1.8", "Free T4").value == 1.2
+
+
+def test_unit_with_embedded_digits():
+    result = parse("eGFR 98 mL/min/1.73 m2 > 60", "Estimated GFR")
+    assert result.value == 98
+    assert result.value_text == "98 mL/min/1.73 m2"
+
+
+def test_value_after_range():
+    assert parse("Serum Iron 60 - 170 95 ug/dL", "Serum Iron").value == 95
+
+
+def test_ambiguous_numbers_are_not_parsed():
+    assert parse("Serum Iron 95 ug/dL 60 - 170 2", "Serum Iron") is None
+
+
+# -----------------------------
+# Strict and inclusive bounds
+# -----------------------------
+@pytest.mark.parametrize("marker, line, normal", [
+    ("hs-CRP", "hs-CRP 1.0 mg/L < 1.0", False),
+    ("hs-CRP", "hs-CRP 1.0 mg/L <= 1.0", True),
+    ("hs-CRP", "hs-CRP 1.0 mg/L ≤ 1.0", True),
+    ("hs-CRP", "hs-CRP 0.9 mg/L < 1.0", True),
+    ("TSH", "TSH 4.2 uIU/mL 0.4 - 4.2", True),
+    ("TSH", "TSH 4.3 uIU/mL 0.4 - 4.2", False),
+    ("HDL Cholesterol", "HDL Cholesterol 40 mg/dL > 40", False),
+    ("HDL Cholesterol", "HDL Cholesterol 40 mg/dL >= 40", True),
+    ("HDL Cholesterol", "HDL Cholesterol 41 mg/dL > 40", True),
+])
+def test_strict_and_inclusive_bounds(marker, line, normal):
+    result = parse(line, marker)
+    assert check_ranges([result.value], [result.low], [result.high])[0] == normal
+
+
+# -----------------------------
+# Abnormal flags
+# -----------------------------
+@pytest.mark.parametrize("line", [
+    "Sodium 145 H mmol/L 135 - 145",
+    "Sodium 145H mmol/L 135 - 145",
+    "Sodium 135 mmol/L 135 - 145 L",
+])
+def test_flagged_values(line):
+    result = parse(line, "Sodium")
+    assert result.flagged
+
+
+def test_flagged_value_goes_to_llm():
+    text = "Serum Creatinine 1.3 H mg/dL 0.7 - 1.3\neGFR 95 mL/min > 60\nSodium 140 mmol/L 135 - 145"
+    assert normal_fast_path("Kidney", text) is None
+
+
+# -----------------------------
+# Repeated markers and urine specimens
+# -----------------------------
+def test_urine_lines_do_not_hide_low_serum_values():
+    text = (
+        "Urine Total Protein 10 mg/dL 0 - 15\nUrine Albumin 5 mg/L 0 - 20\n"
+        "Total Protein 5.1 L g/dL 6.4 - 8.3\nAlbumin 2.6 g/dL 3.5 - 5.2\n"
+        "Iron 80 ug/dL 60 - 170"
+    )
+    assert parse(text, "Total Protein").value == 5.1
+    assert parse(text, "Albumin").value == 2.6
+    assert normal_fast_path("Nutrition", text) is None
+
+
+def test_urine_calcium_does_not_hide_low_serum_calcium():
+    text = (
+        "Calcium, Urine 150 mg/24hr 100 - 300\nCalcium 7.8 mg/dL 8.6 - 10.3\n"
+        "Serum Creatinine 0.9 mg/dL 0.7 - 1.3\neGFR 95 mL/min > 60"
+    )
+    assert parse(text, "Calcium").value == 7.8
+    assert normal_fast_path("Kidney", text) is None
+
+
+@pytest.mark.parametrize("line", [
+    "Urine Albumin 5 mg/L 0 - 20",
+    "24 Hr Urine Protein 120 mg/day < 150",
+    "Total Protein, 24 hr 120 mg/day < 150",
+    "Creatinine, Urine 110 mg/dL 20 - 320",
+])
+def test_urine_specimens_are_not_blood_markers(line):
+    assert extract_markers(line, ["Albumin", "Total Protein", "Serum Creatinine"]) == {}
+
+
+def test_marker_on_several_lines_goes_to_llm():
+    text = "Calcium 9.1 mg/dL 8.6 - 10.3\nCalcium (ionized) 4.2 mg/dL 4.6 - 5.3"
+    assert parse(text, "Calcium") is None
+
+    text += "\nSerum Creatinine 0.9 mg/dL 0.7 - 1.3\neGFR 95 mL/min > 60"
+    assert normal_fast_path("Kidney", text) is None
+
+
+# -----------------------------
+# Core markers and conclusions
+# -----------------------------
+def test_core_markers_required():
+    assert normal_fast_path("Kidney", "Sodium 140 mmol/L 135 - 145") is None
+    assert normal_fast_path("Diabetes", "hs-CRP 0.8 mg/L < 1.0") is None
+
+
+def test_conclusion_only_covers_checked_markers():
+    text = "HbA1c 5.4 % 4.0 - 5.6\nFasting Blood Sugar 88 mg/dL 70 - 100"
+    summary = normal_fast_path("Diabetes", text)
+    assert "- HbA1c: 5.4 % (4.0 - 5.6) → Normal" in summary
+    assert "Supporting Risk Factors" not in summary
+    conclusion = summary.split("### Conclusion", 1)[1].lower()
+    assert "lipid" not in conclusion and "inflammation" not in conclusion
+
+
+def test_all_normal_section_uses_template():
+    text = (
+        "HbA1c 5.4 % 4.0 - 5.6\nFasting Blood Sugar 88 mg/dL 70 - 100\n"
+        "hs-CRP 0.8 mg/L < 1.0\nTotal Cholesterol 170 mg/dL < 200"
+    )
+    summary = normal_fast_path("Diabetes", text)
+    assert summary.startswith("### Core Diabetes Markers")
+    assert "### Supporting Risk Factors" in summary
+    assert "- Total Cholesterol: 170 mg/dL (< 200) → Normal" in summary
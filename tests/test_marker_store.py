@@ -0,0 +1,88 @@
+import os
+
+import numpy as np
+import pytest
+
+from app import ANALYTES, MarkerStore, extract_markers
+
+
+def report(hba1c, tsh_line="TSH 2.1 uIU/mL 0.4 - 4.2"):
+    return extract_markers(f"HbA1c {hba1c} % 4.0 - 5.6\n{tsh_line}", ANALYTES)
+
+
+def test_path_without_suffix_round_trips(tmp_path):
+    path = str(tmp_path / "markers")
+    MarkerStore(path).add_report("p1", "2025-01-01", report(5.4))
+
+    store = MarkerStore(path)
+    store.add_report("p1", "2025-06-01", report(5.9))
+
+    assert store.path == path + ".npz"
+    assert os.listdir(tmp_path) == ["markers.npz"]
+    hba1c = MarkerStore(path).trends("p1", ["HbA1c"])[0]
+    assert hba1c["reports"] == 2
+
+
+def test_same_date_replaces_earlier_rows(tmp_path):
+    store = MarkerStore(str(tmp_path / "m.npz"))
+    store.add_report("p1", "2025-01-01", report(5.4))
+    store.add_report("p1", "2025-01-01", report(5.5))
+
+    hba1c = store.trends("p1", ["HbA1c"])[0]
+    assert hba1c["reports"] == 1
+    assert hba1c["last_value"] == 5.5
+
+
+def test_trends_and_range_crossings(tmp_path):
+    store = MarkerStore(str(tmp_path / "m.npz"))
+    for day, value in [("2025-01-01", 5.4), ("2025-07-02", 5.8), ("2026-01-01", 5.5)]:
+        store.add_report("p1", day, report(value))
+
+    hba1c = store.trends("p1", ["HbA1c"])[0]
+    assert hba1c["delta"] == 0.1
+    assert hba1c["range_crossings"] == 2
+    assert hba1c["status"] == "Normal"
+
+
+def test_ambiguous_rows_are_not_recorded(tmp_path):
+    store = MarkerStore(str(tmp_path / "m.npz"))
+    recorded = store.add_report(
+        "p1", "2025-01-01", report(5.4, tsh_line="TSH 6.2 uIU/mL Adult 0.4 - 4.2 Elderly 0.5 - 6.0")
+    )
+
+    assert recorded == 1
+    assert [row["analyte"] for row in store.trends("p1")] == ["HbA1c"]
+
+
+def test_urine_values_are_not_recorded_as_serum(tmp_path):
+    store = MarkerStore(str(tmp_path / "m.npz"))
+    markers = extract_markers("Urine Albumin 5 mg/L 0 - 20\nHbA1c 5.4 % 4.0 - 5.6", ANALYTES)
+
+    assert store.add_report("p1", "2025-01-01", markers) == 1
+    assert [row["analyte"] for row in store.trends("p1")] == ["HbA1c"]
+
+
+def test_same_date_keeps_other_analytes(tmp_path):
+    store = MarkerStore(str(tmp_path / "m.npz"))
+    store.add_report("p1", "2025-01-01", extract_markers("HbA1c 5.4 % 4.0 - 5.6", ANALYTES))
+    store.add_report("p1", "2025-01-01", extract_markers("TSH 2.1 uIU/mL 0.4 - 4.2", ANALYTES))
+
+    assert [row["analyte"] for row in store.trends("p1")] == ["HbA1c", "TSH"]
+
+
+@pytest.mark.parametrize("content", [b"", b"not a zip file", b"PK\x03\x04truncated"])
+def test_unreadable_store_starts_empty(tmp_path, content):
+    path = tmp_path / "m.npz"
+    path.write_bytes(content)
+
+    store = MarkerStore(str(path))
+
+    assert store.trends("p1") == []
+    assert store.add_report("p1", "2025-01-01", report(5.4)) == 2
+
+
+def test_store_missing_a_column_starts_empty(tmp_path):
+    path = str(tmp_path / "m.npz")
+    np.savez(path, patient=np.array(["p1"]))
+
+    assert MarkerStore(path).trends("p1") == []
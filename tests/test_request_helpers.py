@@ -0,0 +1,45 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+import asgi
+from app import RequestError, app, report_params, trend_params
+
+
+def test_report_params():
+    assert report_params({}) == (None, None)
+    assert report_params({"patient_id": "p1", "report_date": "2025-03-01"}) == (
+        "p1", np.datetime64("2025-03-01", "D")
+    )
+    with pytest.raises(RequestError, match="YYYY-MM-DD"):
+        report_params({"patient_id": "p1", "report_date": "03/01/2025"})
+    with pytest.raises(RequestError, match="required"):
+        report_params({"patient_id": "p1"})
+
+
+def test_trend_params():
+    assert trend_params({"patient_id": "p1", "analytes": "HbA1c, TSH", "narrative": "True"}) == (
+        "p1", ["HbA1c", "TSH"], True
+    )
+    assert trend_params({"patient_id": "p1", "analytes": ["TSH"]}) == ("p1", ["TSH"], False)
+    with pytest.raises(RequestError, match="Unknown analytes: Foo"):
+        trend_params({"patient_id": "p1", "analytes": "Foo"})
+
+
+@pytest.mark.parametrize("query, status", [
+    ("", 400),
+    ("?patient_id=nobody-stored", 404),
+    ("?patient_id=p1&analytes=Foo", 400),
+])
+def test_both_serving_modes_agree(query, status):
+    flask_response = app.test_client().get(f"/marker_trends{query}")
+
+    async def quart_request():
+        response = await asgi.app.test_client().get(f"/marker_trends{query}")
+        return response.status_code, await response.get_json()
+
+    quart_response = asyncio.run(quart_request())
+
+    assert (flask_response.status_code, flask_response.get_json()) == quart_response
+    assert quart_response[0] == status
@@ -0,0 +1,132 @@
+import asyncio
+import io
+import re
+
+import pytest
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+from PyPDF2 import PdfReader
+from quart.datastructures import FileStorage
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+import app
+import asgi
+
+
+class FakeEmbeddings(Embeddings):
+    def embed_documents(self, texts):
+        return [[float(len(t)), 1.0] for t in texts]
+
+    def embed_query(self, text):
+        return [1.0, 1.0]
+
+
+def echo_patient(prompt_value):
+    patient = re.search(r"Patient ID: (\w+)", prompt_value.to_string()).group(1)
+    return AIMessage(content=f"### Patient\n- Summary for {patient}")
+
+
+async def aecho_patient(prompt_value):
+    await asyncio.sleep(0.01)
+    return echo_patient(prompt_value)
+
+
+@pytest.fixture(autouse=True)
+def stub_backends(tmp_path, monkeypatch):
+    cache = app.SummaryCache(str(tmp_path / "cache.json"), flush_delay=60)
+    llm, embeddings = RunnableLambda(echo_patient, afunc=aecho_patient), FakeEmbeddings()
+    for module in (app, asgi):
+        monkeypatch.setattr(module, "summary_cache", cache)
+        monkeypatch.setattr(module, "get_llm", lambda: llm)
+        monkeypatch.setattr(module, "get_embeddings", lambda: embeddings)
+
+
+def report_pdf(patient):
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    for page in range(23):
+        pdf.drawString(40, 800, f"Patient ID: {patient} page {page}")
+        pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+def pdf_text(data):
+    return "\n".join(page.extract_text() for page in PdfReader(io.BytesIO(data)).pages)
+
+
+def test_flask_summarize_all_returns_pdf():
+    client = app.app.test_client()
+    client.post("/upload_pdf", data={"file": (io.BytesIO(report_pdf("Alice")), "alice.pdf")})
+
+    response = client.post("/summarize_all")
+
+    assert response.status_code == 200
+    assert response.mimetype == "application/pdf"
+    assert "Summary for Alice" in pdf_text(response.data)
+
+
+def test_concurrent_async_summaries_get_their_own_pdf():
+    async def summarize(patient):
+        client = asgi.app.test_client()
+        pdf = FileStorage(io.BytesIO(report_pdf(patient)), filename=f"{patient}.pdf")
+        await client.post("/upload_pdf", files={"file": pdf})
+        response = await client.post("/summarize_all")
+        return pdf_text(await response.get_data())
+
+    async def main():
+        return await asyncio.gather(*(summarize(p) for p in ("Alice", "Bob", "Carol", "Dave")))
+
+    for patient, text in zip(("Alice", "Bob", "Carol", "Dave"), asyncio.run(main())):
+        assert f"Summary for {patient}" in text
+        assert len(set(re.findall(r"Summary for (\w+)", text))) == 1
+
+
+def test_same_filename_uploads_keep_their_own_summaries():
+    alice, bob = app.app.test_client(), app.app.test_client()
+    alice.post("/upload_pdf", data={"file": (io.BytesIO(report_pdf("Alice")), "report.pdf")})
+    bob.post("/upload_pdf", data={"file": (io.BytesIO(report_pdf("Bob")), "report.pdf")})
+
+    assert alice.post("/summarize_thyroid").get_json()["summary"].endswith("Alice")
+
+    # A later upload of Alice's report is served Alice's cached summary
+    again = app.app.test_client()
+    again.post("/upload_pdf", data={"file": (io.BytesIO(report_pdf("Alice")), "report.pdf")})
+    response = again.post("/summarize_thyroid").get_json()
+    assert response["cached"] is True
+    assert response["summary"].endswith("Alice")
+
+
+@pytest.mark.parametrize("data, error", [
+    ({"patient_id": "p1", "report_date": "01/03/2025"}, "YYYY-MM-DD"),
+    ({"patient_id": "p1"}, "required"),
+    ({"file": (io.BytesIO(b"not a pdf"), "notes.txt")}, "not a readable PDF"),
+])
+def test_rejected_upload_changes_nothing(data, error):
+    client = app.app.test_client()
+    client.post("/upload_pdf", data={"file": (io.BytesIO(report_pdf("Alice")), "alice.pdf")})
+    with client.session_transaction() as session:
+        before = dict(session)
+
+    data.setdefault("file", (io.BytesIO(report_pdf("Bob")), "bob.pdf"))
+    response = client.post("/upload_pdf", data=data)
+
+    assert response.status_code == 400
+    assert error in response.get_json()["error"]
+    with client.session_transaction() as session:
+        assert dict(session) == before
+    assert client.post("/summarize_thyroid").get_json()["summary"].endswith("Alice")
+    assert len(app.summary_cache._documents) == 1
+
+
+def test_async_non_pdf_upload_is_rejected():
+    async def upload():
+        client = asgi.app.test_client()
+        response = await client.post("/upload_pdf", files={"file": FileStorage(io.BytesIO(b"x"), filename="x.pdf")})
+        return response.status_code, await response.get_json()
+
+    status, body = asyncio.run(upload())
+    assert status == 400
+    assert body["error"] == "The uploaded file is not a readable PDF"
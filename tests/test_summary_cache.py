@@ -0,0 +1,66 @@
+import json
+
+from app import SummaryCache, section_key
+
+
+def doc(*pages):
+    return [f"hash-{p}" for p in pages]
+
+
+def test_corrupt_file_starts_empty(tmp_path):
+    path = tmp_path / "cache.json"
+    path.write_text('{"documents": {"abc": ["h', encoding="utf-8")
+
+    cache = SummaryCache(str(path))
+
+    assert cache.get("anything") is None
+    assert cache.add_document(doc(*range(23)))[1] is None
+
+
+def test_revision_diff_against_closest_document(tmp_path):
+    cache = SummaryCache(str(tmp_path / "cache.json"))
+    cache.add_document(doc(*range(23)))
+    cache.add_document(["other"] * 23)
+
+    revised = doc(*range(23))
+    revised[22] = "hash-22-corrected"
+    _, diff = cache.add_document(revised)
+
+    assert diff["changed_pages"] == [22]
+    assert diff["sections_refreshed"] == ["Thyroid"]
+    assert "Diabetes" in diff["sections_reused"]
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = SummaryCache(str(tmp_path / "cache.json"), max_documents=2, max_summaries=2)
+    first, _ = cache.add_document(doc(1))
+    second, _ = cache.add_document(doc(2))
+    cache.hashes(first)
+    cache.add_document(doc(3))
+
+    assert cache.hashes(first) == doc(1)
+    assert cache.hashes(second) is None
+    # Evicted documents no longer match new uploads
+    assert cache.add_document(doc(2))[1] is None
+
+    for key in ("a", "b", "c"):
+        cache.put(key, key.upper())
+    assert cache.get("a") is None
+    assert cache.get("c") == "C"
+
+
+def test_flush_round_trips(tmp_path):
+    path = tmp_path / "cache.json"
+    cache = SummaryCache(str(path), flush_delay=60)
+    doc_id, _ = cache.add_document(doc(*range(23)))
+    key = section_key("Thyroid", [3, 7, 10, 22], doc(*range(23)))
+    cache.put(key, "### Thyroid")
+    assert not path.exists()
+
+    cache.flush()
+
+    assert list(tmp_path.iterdir()) == [path]
+    reloaded = SummaryCache(str(path))
+    assert reloaded.hashes(doc_id) == doc(*range(23))
+    assert reloaded.get(key) == "### Thyroid"
+    assert json.loads(path.read_text(encoding="utf-8"))["summaries"] == {key: "### Thyroid"}